@@ -2,101 +2,212 @@
 import asyncio
 import logging
 import os
+import time
+from dataclasses import dataclass
 from datetime import datetime
+from itertools import islice
 from typing import Dict, Any, List
 
 from fastapi import WebSocket, WebSocketDisconnect, HTTPException, status
+from starlette.requests import HTTPConnection
 
 from .models import DashboardMetrics, ActiveCallsMetric, DemoErrorRequest, SimulateActiveCallsRequest
 from .websocket_manager import ConnectionManager
 from .metrics_aggregator import MetricsAggregator
-from .redis_consumer import VocodeRedisConsumer
+from .redis_consumer import VocodeRedisConsumer, ERROR_BUFFER_MAXLEN
 
 logger = logging.getLogger(__name__)
 
-# Global variables for API endpoints
-manager: ConnectionManager | None = None
-redis_consumer: VocodeRedisConsumer | None = None
-aggregator: MetricsAggregator | None = None
+# Dashboard refresh interval in seconds, read once at import time
+REFRESH_INTERVAL_S: float = int(os.getenv("DASHBOARD_REFRESH_INTERVAL", "5000")) / 1000.0
 
-def set_global_dependencies(
-    connection_manager: ConnectionManager,
-    redis_consumer_instance: VocodeRedisConsumer | None,
-    metrics_aggregator: MetricsAggregator
-) -> None:
-    """Set global dependencies for API endpoints."""
-    global manager, redis_consumer, aggregator
-    manager = connection_manager
-    redis_consumer = redis_consumer_instance
-    aggregator = metrics_aggregator
+# Redis ping bounds for health_check
+HEALTH_PING_TIMEOUT_S: float = 0.5
+HEALTH_PING_CACHE_S: float = 1.0  # Reuse a successful ping this recent instead of pinging again
 
-async def websocket_endpoint(websocket: WebSocket) -> None:
-    """WebSocket endpoint for real-time metrics broadcasting."""
-    logger.info("WebSocket endpoint function called")
-    
-    if manager is None:
-        logger.error("Manager is None, closing WebSocket connection")
-        await websocket.close(code=1008)  # Policy violation
+# Lifetime of the cached metrics snapshot
+METRICS_CACHE_TTL_S: float = REFRESH_INTERVAL_S / 2
+
+# Unchanged metrics are not re-broadcast, but clients still get a refresh at least this often
+BROADCAST_MAX_SILENCE_S: float = 30.0
+# After a state change, wait this long so a burst of events goes out as one frame
+BROADCAST_COALESCE_S: float = 0.1
+
+@dataclass
+class AppCaches:
+    """Mutable per-app caches; owned by AppState so separate apps never share them."""
+    metrics_snapshot: tuple[float, DashboardMetrics] | None = None  # (time.monotonic() when built, metrics)
+    last_successful_ping: float | None = None  # time.monotonic() of the last successful Redis ping
+
+@dataclass(frozen=True)
+class AppState:
+    """Services shared by the API endpoints, built once in lifespan and stored on app.state.deps."""
+    manager: ConnectionManager
+    redis_consumer: VocodeRedisConsumer | None
+    aggregator: MetricsAggregator
+    caches: AppCaches
+
+def get_deps(connection: HTTPConnection) -> AppState:
+    """FastAPI dependency returning the AppState for both HTTP and WebSocket routes."""
+    return connection.app.state.deps
+
+def build_dashboard_metrics(redis_consumer: VocodeRedisConsumer, aggregator: MetricsAggregator) -> DashboardMetrics:
+    """Build a full DashboardMetrics snapshot from the current consumer state, stamped with one `now`."""
+    now = datetime.now()
+    live_status, error_summary, financial_impact = aggregator.aggregate_all(redis_consumer, now)
+    # Every field is produced internally with the right types, so skip per-tick validation
+    return DashboardMetrics.model_construct(
+        live_status=live_status,
+        active_calls=ActiveCallsMetric.model_construct(
+            count=redis_consumer.active_calls,
+            timestamp=now
+        ),
+        error_summary=error_summary,
+        financial_impact=financial_impact,
+        last_updated=now
+    )
+
+def get_cached_metrics(deps: AppState, ttl: float = METRICS_CACHE_TTL_S) -> DashboardMetrics | None:
+    """
+    Return the cached metrics snapshot if younger than ttl, otherwise rebuild it.
+    Building is synchronous, so concurrent callers on the event loop never rebuild twice.
+    Returns None if the Redis consumer is not initialized.
+    """
+    if deps.redis_consumer is None:
+        return None
+    now = time.monotonic()
+    snapshot = deps.caches.metrics_snapshot
+    if snapshot is not None and now - snapshot[0] < ttl:
+        return snapshot[1]
+    metrics = build_dashboard_metrics(deps.redis_consumer, deps.aggregator)
+    deps.caches.metrics_snapshot = (now, metrics)
+    return metrics
+
+def invalidate_metrics_cache(deps: AppState) -> None:
+    """Drop the cached snapshot so the next read reflects a state change immediately."""
+    deps.caches.metrics_snapshot = None
+
+async def wait_for_metrics_change(deps: AppState, max_interval: float) -> None:
+    """
+    Wait until the consumer reports a state change or max_interval elapses.
+    The interval bound keeps time-based values (windows, ROI) fresh when nothing changes.
+    Changes are coalesced for BROADCAST_COALESCE_S so an event storm yields one broadcast per tick.
+    """
+    redis_consumer = deps.redis_consumer
+    if redis_consumer is None:
+        await asyncio.sleep(max_interval)
+        return
+    try:
+        await asyncio.wait_for(redis_consumer.metrics_dirty.wait(), timeout=max_interval)
+    except asyncio.TimeoutError:
         return
+    await asyncio.sleep(BROADCAST_COALESCE_S)
+    redis_consumer.metrics_dirty.clear()
+    # The cached snapshot predates the change
+    invalidate_metrics_cache(deps)
+
+def metrics_signature(metrics: DashboardMetrics) -> int:
+    """Hash of the metrics content, ignoring the timestamps that change on every build."""
+    return hash((
+        metrics.live_status.status,
+        metrics.live_status.message,
+        metrics.active_calls.count,
+        tuple(
+            (e.error_type, e.count, e.last_occurrence, e.severity)
+            for e in metrics.error_summary
+        ),
+        metrics.financial_impact.estimated_revenue_per_min,
+        metrics.financial_impact.estimated_cost_of_recent_errors,
+        metrics.financial_impact.total_roi,
+    ))
+
+async def metrics_producer_loop(deps: AppState) -> None:
+    """
+    Single background task that builds metrics whenever consumer state changes
+    (or at least once per refresh interval) and fans them out to every
+    connected client, so aggregation cost does not scale with the number of
+    WebSocket connections. Ticks whose content is unchanged are skipped, up to
+    BROADCAST_MAX_SILENCE_S.
+    """
+    manager = deps.manager
+    last_signature: int | None = None
+    last_broadcast_at = 0.0
+    while True:
+        try:
+            # Debug logging to see the state; guarded so nothing is formatted per tick in production
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Metrics producer - Active connections: %d, Redis consumer: %s",
+                             len(manager.active_connections),
+                             deps.redis_consumer is not None)
+            
+            metrics = get_cached_metrics(deps) if manager.active_connections else None
+            if metrics: # Only send if there are active connections
+                signature = metrics_signature(metrics)
+                
+                if signature == last_signature and time.monotonic() - last_broadcast_at < BROADCAST_MAX_SILENCE_S:
+                    logger.debug("Skipping broadcast - metrics unchanged since last tick")
+                else:
+                    # Debug logging for financial metrics
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("WebSocket Broadcast Debug - Active Calls: %d, Financial Impact: %s",
+                                     metrics.active_calls.count, metrics.financial_impact)
+                    
+                    await manager.broadcast_metrics(metrics)
+                    last_signature = signature
+                    last_broadcast_at = time.monotonic()
+            else:
+                logger.debug("Skipping broadcast - no active connections or missing required components")
+        except Exception as e:
+            logger.exception(f"Error in metrics_producer_loop: {e}")
+        
+        await wait_for_metrics_change(deps, REFRESH_INTERVAL_S)
+
+async def websocket_endpoint(websocket: WebSocket, deps: AppState) -> None:
+    """WebSocket endpoint; metrics are pushed to it by metrics_producer_loop."""
+    logger.info("WebSocket endpoint function called")
     
-    logger.info("Manager is available, connecting WebSocket")
+    manager = deps.manager
     await manager.connect(websocket)
-    logger.info("WebSocket connected, entering broadcast loop")
+    logger.info("WebSocket connected, waiting for disconnect")
     
     try:
+        # Send an initial snapshot so new clients don't wait a full refresh interval
+        metrics = get_cached_metrics(deps)
+        if metrics:
+            await manager.send_metrics(websocket, metrics)
+        
+        # The client never sends data; receiving only serves to detect the disconnect
         while True:
-            # Debug logging to see the state
-            logger.info(f"WebSocket loop - Active connections: {len(manager.active_connections) if manager else 0}, "
-                       f"Redis consumer: {redis_consumer is not None}, "
-                       f"Aggregator: {aggregator is not None}")
-            
-            if manager.active_connections and redis_consumer and aggregator: # Only send if there are active connections
-                metrics = DashboardMetrics(
-                    live_status=aggregator.calculate_live_status(redis_consumer),
-                    active_calls=ActiveCallsMetric(
-                        count=redis_consumer.active_calls,
-                        timestamp=datetime.now()
-                    ),
-                    error_summary=aggregator.get_24h_error_summary(redis_consumer),
-                    financial_impact=aggregator.calculate_financial_metrics(redis_consumer),
-                    last_updated=datetime.now()
-                )
-                
-                # Debug logging for financial metrics
-                logger.info(f"WebSocket Broadcast Debug - Active Calls: {metrics.active_calls.count}, "
-                           f"Financial Impact: {metrics.financial_impact}")
-                
-                await manager.broadcast_metrics(metrics)
-            else:
-                logger.info("Skipping broadcast - missing required components")
-            
-            # Use the environment variable for refresh interval
-            refresh_interval_ms = int(os.getenv("DASHBOARD_REFRESH_INTERVAL", "5000"))
-            await asyncio.sleep(refresh_interval_ms / 1000.0)
+            await websocket.receive_text()
 
     except WebSocketDisconnect:
         logger.info("WebSocket disconnected.")
     except Exception as e:
         logger.exception(f"Error in websocket_endpoint: {e}")
     finally:
-        if manager:
-            manager.disconnect(websocket) # Ensure disconnection is handled
+        manager.disconnect(websocket) # Ensure disconnection is handled
 
-async def inject_demo_error(request: DemoErrorRequest, broadcast: bool = True) -> Dict[str, str]:
+async def inject_demo_error(deps: AppState, request: DemoErrorRequest, broadcast: bool = True) -> Dict[str, str]:
     """
     Allows injecting simulated error events for demonstration purposes.
-    If broadcast is True, it will immediately broadcast updated metrics.
+    Clients are updated by metrics_producer_loop, which add_error wakes and which
+    coalesces a burst of injections into a single broadcast. `broadcast` is ignored
+    and only kept so existing callers don't break.
     """
-    if redis_consumer is None or aggregator is None or manager is None:
-        logger.error("Attempted to inject demo error, but a required service is not initialized.")
+    redis_consumer = deps.redis_consumer
+    if redis_consumer is None:
+        logger.error("Attempted to inject demo error, but Redis consumer is not initialized.")
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Error: A required service is not initialized."
+            detail="Error: Redis consumer service not initialized."
         )
 
+    # All errors in one bulk injection share a single timestamp
+    timestamp_ms = time.time_ns() // 1_000_000
+    # Anything beyond the buffer cap would only evict errors from this same request
+    count = min(request.count, ERROR_BUFFER_MAXLEN)
     injected_count = 0
-    for _ in range(request.count):
-        timestamp_ms = str(int(datetime.now().timestamp() * 1000))
+    for _ in range(count):
         demo_error_data: Dict[str, Any] = {
             "timestamp": timestamp_ms,
             "error_type": request.error_type,
@@ -104,31 +215,21 @@ async def inject_demo_error(request: DemoErrorRequest, broadcast: bool = True) -
             "severity": request.severity,
             "conversation_id": request.conversation_id
         }
-        redis_consumer.error_buffer.append(demo_error_data)
+        redis_consumer.add_error(demo_error_data)
         injected_count += 1
-        logger.warning(f"DEMO MODE: Injected error. Type: '{request.error_type}', Severity: '{request.severity.upper()}', Message: '{request.message}', Count: {injected_count}")
+    logger.warning("DEMO MODE: Injected %d errors. Type: '%s', Severity: '%s', Message: %r",
+                   injected_count, request.error_type, request.severity.upper(), request.message)
 
-    if broadcast:
-        # After injecting, immediately recalculate and broadcast metrics
-        metrics = DashboardMetrics(
-            live_status=aggregator.calculate_live_status(redis_consumer),
-            active_calls=ActiveCallsMetric(
-                count=redis_consumer.active_calls,
-                timestamp=datetime.now()
-            ),
-            error_summary=aggregator.get_24h_error_summary(redis_consumer),
-            financial_impact=aggregator.calculate_financial_metrics(redis_consumer),
-            last_updated=datetime.now()
-        )
-        await manager.broadcast_metrics(metrics)
+    invalidate_metrics_cache(deps)
 
     return {"message": f"Successfully injected {injected_count} errors of type '{request.error_type}' with severity '{request.severity}'.", "status": "success"}
 
-async def simulate_active_calls(request: SimulateActiveCallsRequest) -> Dict[str, str]:
+async def simulate_active_calls(deps: AppState, request: SimulateActiveCallsRequest) -> Dict[str, str]:
     """
     Allows simulating a specific number of active calls for demonstration purposes.
     NOTE: THIS ENDPOINT IS FOR DEMO/DEVELOPMENT ONLY AND SHOULD BE REMOVED OR SECURED IN PRODUCTION.
     """
+    redis_consumer = deps.redis_consumer
     if redis_consumer is None:
         logger.error("Attempted to simulate active calls, but Redis consumer is not initialized.")
         raise HTTPException(
@@ -138,12 +239,14 @@ async def simulate_active_calls(request: SimulateActiveCallsRequest) -> Dict[str
 
     # Add/subtract from current active calls
     redis_consumer.active_calls = max(0, redis_consumer.active_calls + request.delta)
+    redis_consumer.metrics_dirty.set()
+    invalidate_metrics_cache(deps)
     logger.warning(f"DEMO MODE: Active calls changed by {request.delta}. New total: {redis_consumer.active_calls}")
 
     action_word = "added" if request.delta >= 0 else "subtracted"
     return {"message": f"Successfully {action_word} {abs(request.delta)} active calls. New total: {redis_consumer.active_calls}.", "status": "success"}
 
-async def reset_demo_state() -> Dict[str, str]:
+async def reset_demo_state(deps: AppState) -> Dict[str, str]:
     """
     Resets all demo-related states to their defaults.
     - Resets active calls to 0.
@@ -151,6 +254,7 @@ async def reset_demo_state() -> Dict[str, str]:
     - Resets app start time for Min Run calculation.
     NOTE: THIS ENDPOINT IS FOR DEMO/DEVELOPMENT ONLY.
     """
+    redis_consumer = deps.redis_consumer
     if redis_consumer is None:
         logger.error("Attempted to reset demo state, but Redis consumer is not initialized.")
         raise HTTPException(
@@ -160,25 +264,27 @@ async def reset_demo_state() -> Dict[str, str]:
 
     # Reset active calls
     redis_consumer.active_calls = 0
+    redis_consumer.metrics_dirty.set()
     
     # Clear the error buffer
-    redis_consumer.error_buffer.clear()
+    redis_consumer.clear_errors()
+    invalidate_metrics_cache(deps)
     
     # Reset app start time for Min Run calculation
-    import src.main as main_app_globals
-    if main_app_globals.app_start_time:
-        main_app_globals.app_start_time = datetime.now()
-        logger.warning("DEMO MODE: Resetting app_start_time for Min Run calculation.")
+    deps.aggregator.app_start_time = datetime.now()
+    logger.warning("DEMO MODE: Resetting app_start_time for Min Run calculation.")
     
     logger.warning("DEMO MODE: All demo states have been reset.")
     
     return {"message": "All demo states reset.", "status": "success"}
 
-async def health_check() -> Dict[str, Any]:
+async def health_check(deps: AppState) -> Dict[str, Any]:
     """Enhanced health check that includes Redis connectivity status and LiveStatus calculation."""
+    redis_consumer = deps.redis_consumer
+    now = datetime.now()
     health_status: Dict[str, Any] = {
         "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": now.isoformat(),
         "redis_connected": False,
         "active_calls": 0,
         "error_count": 0,
@@ -187,32 +293,26 @@ async def health_check() -> Dict[str, Any]:
     }
     
     # Check WebSocket connections
-    if manager:
-        health_status["websocket_connections"] = len(manager.active_connections)
+    health_status["websocket_connections"] = len(deps.manager.active_connections)
     
     # Calculate LiveStatus for comprehensive health assessment
-    if aggregator:
-        live_status = aggregator.calculate_live_status(redis_consumer)
-        health_status["live_status"] = {
-            "status": live_status.status,
-            "message": live_status.message,
-            "last_updated": live_status.last_updated.isoformat()
-        }
-        
-        # Prioritize LiveStatus over Redis connectivity for overall system health
-        if live_status.status == "red":
-            health_status["status"] = "degraded"
-            health_status["message"] = f"System compromised: {live_status.message}"
-        elif live_status.status == "yellow":
-            health_status["status"] = "degraded"
-            health_status["message"] = f"System warning: {live_status.message}"
-        else:
-            health_status["status"] = "healthy"
-            health_status["message"] = live_status.message
-    else:
+    live_status = deps.aggregator.calculate_live_status(redis_consumer, now)
+    health_status["live_status"] = {
+        "status": live_status.status,
+        "message": live_status.message,
+        "last_updated": live_status.last_updated.isoformat()
+    }
+    
+    # Prioritize LiveStatus over Redis connectivity for overall system health
+    if live_status.status == "red":
         health_status["status"] = "degraded"
-        health_status["message"] = "Metrics aggregator not initialized"
-        return health_status
+        health_status["message"] = f"System compromised: {live_status.message}"
+    elif live_status.status == "yellow":
+        health_status["status"] = "degraded"
+        health_status["message"] = f"System warning: {live_status.message}"
+    else:
+        health_status["status"] = "healthy"
+        health_status["message"] = live_status.message
     
     # Check Redis connectivity (secondary to LiveStatus)
     if redis_consumer is None:
@@ -224,11 +324,21 @@ async def health_check() -> Dict[str, Any]:
     
     if redis_consumer.redis_client:
         try:
-            # Ping Redis to check connectivity - await the async ping
-            await redis_consumer.redis_client.ping()  # type: ignore
+            # Skip the round-trip if Redis answered a ping very recently
+            last_ping = deps.caches.last_successful_ping
+            if last_ping is None or time.monotonic() - last_ping >= HEALTH_PING_CACHE_S:
+                # Bound the ping so an unresponsive Redis cannot hang health probes
+                await asyncio.wait_for(redis_consumer.redis_client.ping(), timeout=HEALTH_PING_TIMEOUT_S)  # type: ignore
+                deps.caches.last_successful_ping = time.monotonic()
             health_status["redis_connected"] = True
             health_status["active_calls"] = redis_consumer.active_calls
             health_status["error_count"] = len(redis_consumer.error_buffer)
+        except asyncio.TimeoutError:
+            logger.warning(f"Redis health check timed out after {HEALTH_PING_TIMEOUT_S}s")
+            health_status["redis_connected"] = False
+            if health_status["live_status"]["status"] == "green":
+                health_status["status"] = "degraded"
+                health_status["message"] = f"Redis connection issue: ping timed out after {HEALTH_PING_TIMEOUT_S}s"
         except Exception as e:
             logger.warning(f"Redis health check failed: {e}")
             health_status["redis_connected"] = False
@@ -245,24 +355,20 @@ async def health_check() -> Dict[str, Any]:
     
     return health_status
 
-async def get_error_logs(error_type: str, limit: int = 50) -> Dict[str, List[Dict[str, Any]]]:
+async def get_error_logs(deps: AppState, error_type: str, limit: int = 50) -> Dict[str, List[Dict[str, Any]]]:
     """Fetch recent error logs for drill-down functionality."""
+    redis_consumer = deps.redis_consumer
     if redis_consumer is None:
         logger.error("get_error_logs called but redis_consumer is None.")
         return {"errors": []}
     
     logger.info(f"Fetching logs for error_type: '{error_type}'. Buffer size: {len(redis_consumer.error_buffer)}")
 
-    # Filter error_buffer for matching error_type and sort by timestamp
-    matching_errors: List[Dict[str, Any]] = sorted(
-        [
-            error for error in list(redis_consumer.error_buffer) # Convert deque to list for sorting
-            if error.get('error_type') == error_type
-        ],
-        key=lambda x: int(x['timestamp']), # Sort by timestamp numerically
-        reverse=True # Most recent first
-    )
+    # The per-type index is insertion ordered, so reading it backwards yields the most recent first
+    type_buffer = redis_consumer.errors_by_type.get(error_type, ())
+    # islice rejects negative stops; a negative limit yields no logs instead of a 500
+    matching_errors: List[Dict[str, Any]] = list(islice(reversed(type_buffer), max(limit, 0)))
     
     logger.info(f"Found {len(matching_errors)} matching logs for error_type: '{error_type}'.")
     
-    return {"errors": matching_errors[:limit]} 
\ No newline at end of file
+    return {"errors": matching_errors}
\ No newline at end of file
@@ -1,22 +1,23 @@
 # backend/src/main.py
 import asyncio
+import hashlib
 import logging
 import os
 from contextlib import asynccontextmanager
 from pathlib import Path
 from datetime import datetime
-from typing import Optional
 
-from fastapi import FastAPI, WebSocket, status
+from fastapi import Depends, FastAPI, Request, Response, WebSocket, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 
 from .api_endpoints import (
+    AppCaches, AppState, get_deps,
     websocket_endpoint, health_check, 
-    get_error_logs, set_global_dependencies,
+    get_error_logs,
     inject_demo_error, simulate_active_calls,
-    reset_demo_state
+    reset_demo_state, metrics_producer_loop
 )
 from .metrics_aggregator import MetricsAggregator
 from .redis_consumer import VocodeRedisConsumer
@@ -29,17 +30,15 @@ logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(),
 logger = logging.getLogger(__name__)
 
 # Global variables for lifespan management
-manager: ConnectionManager | None = None
-redis_consumer: VocodeRedisConsumer | None = None
-aggregator: MetricsAggregator | None = None
 consumer_task: asyncio.Task[None] | None = None
-app_start_time: Optional[datetime] = None  # New global variable for tracking app start time
+metrics_task: asyncio.Task[None] | None = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    global manager, redis_consumer, aggregator, consumer_task, app_start_time
+    global consumer_task, metrics_task
     manager = ConnectionManager()
+    redis_consumer: VocodeRedisConsumer | None
     app_start_time = datetime.now()  # Set on app startup
     logger.info(f"FastAPI application started at {app_start_time}.")
     
@@ -58,24 +57,34 @@ async def lifespan(app: FastAPI):
         logger.error(f"Failed to connect to Redis: {e}")
         redis_consumer = None
     
-    aggregator = MetricsAggregator()
+    # Shared services for the API endpoints, injected through Depends(get_deps)
+    deps = AppState(
+        manager=manager,
+        redis_consumer=redis_consumer,
+        aggregator=MetricsAggregator(app_start_time),
+        caches=AppCaches()
+    )
+    app.state.deps = deps
     
-    # Set global dependencies for API endpoints
-    set_global_dependencies(manager, redis_consumer, aggregator)
+    # Single producer builds metrics once per tick for all WebSocket clients
+    metrics_task = asyncio.create_task(metrics_producer_loop(deps))
+    logger.info("Metrics producer started in background.")
     
     # Yield to allow FastAPI to start and become available
     yield
     
     # Shutdown
     logger.info("FastAPI application shutting down.")
-    if consumer_task and not consumer_task.done():
-        consumer_task.cancel()
-        try:
-            await consumer_task
-        except asyncio.CancelledError:
-            pass
+    for task in (metrics_task, consumer_task):
+        if task and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
 
-app = FastAPI(title="Vocode Analytics Dashboard", lifespan=lifespan)
+# orjson (already used for WebSocket payloads) also serializes the HTTP JSON responses
+app = FastAPI(title="Vocode Analytics Dashboard", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # Enable CORS for React frontend
 # In production, specify exact origins
@@ -91,59 +100,75 @@ app.add_middleware(
 # --- API Endpoints ---
 
 @app.websocket("/ws")
-async def websocket_endpoint_handler(websocket: WebSocket):
+async def websocket_endpoint_handler(websocket: WebSocket, deps: AppState = Depends(get_deps)):
     """WebSocket endpoint handler."""
     logger.info("WebSocket endpoint handler called")
     try:
-        await websocket_endpoint(websocket)
+        await websocket_endpoint(websocket, deps)
         logger.info("WebSocket endpoint function completed")
     except Exception as e:
         logger.exception(f"Error in WebSocket endpoint handler: {e}")
         raise
 
 @app.get("/health")
-async def health():
-    return await health_check()
+async def health(deps: AppState = Depends(get_deps)):
+    return await health_check(deps)
 
 @app.get("/logs/{error_type}")
-async def logs_endpoint(error_type: str, limit: int = 50):
-    return await get_error_logs(error_type, limit)
+async def logs_endpoint(error_type: str, limit: int = 50, deps: AppState = Depends(get_deps)):
+    return await get_error_logs(deps, error_type, limit)
 
 @app.post("/demo/error", status_code=status.HTTP_200_OK)
-async def demo_error_endpoint(request: DemoErrorRequest, broadcast: bool = True):
+async def demo_error_endpoint(request: DemoErrorRequest, broadcast: bool = True, deps: AppState = Depends(get_deps)):
     """
     Demo error injection endpoint for testing purposes.
-    `broadcast` query param forces immediate metric broadcast.
+    `broadcast` query param is ignored: every injection is pushed to clients by the metrics producer.
     """
-    return await inject_demo_error(request, broadcast=broadcast)
+    return await inject_demo_error(deps, request, broadcast=broadcast)
 
 @app.post("/demo/active_calls", status_code=status.HTTP_200_OK)
-async def demo_active_calls_endpoint(request: SimulateActiveCallsRequest):
+async def demo_active_calls_endpoint(request: SimulateActiveCallsRequest, deps: AppState = Depends(get_deps)):
     """Demo active calls simulation endpoint for testing purposes."""
-    return await simulate_active_calls(request)
+    return await simulate_active_calls(deps, request)
 
 @app.post("/demo/reset", status_code=status.HTTP_200_OK)
-async def demo_reset_endpoint():
+async def demo_reset_endpoint(deps: AppState = Depends(get_deps)):
     """Endpoint to reset all demo-related states."""
-    return await reset_demo_state()
+    return await reset_demo_state(deps)
 
 # Mount static files - the React build creates a 'static' directory.
 # The 'build' directory from the frontend is copied to 'static' in the Dockerfile.
 static_dir = Path("static")
 if static_dir.exists():
     app.mount("/static", StaticFiles(directory=static_dir / "static"), name="static")
-    
+
+    # index.html is immutable for the lifetime of the container, so read it once
+    # and serve the cached bytes with an ETag that lets browsers revalidate with a 304.
+    index_path = static_dir / "index.html"
+    _INDEX_HTML_RESPONSE: HTMLResponse | None = None
+    _INDEX_HTML_ETAG: str | None = None
+    _FRONTEND_MISSING_RESPONSE = HTMLResponse(content="Frontend not found.", status_code=404)
+    try:
+        _index_html_bytes = index_path.read_bytes()
+    except FileNotFoundError:
+        logger.warning(f"{index_path} not found. Frontend will return 404.")
+    else:
+        _INDEX_HTML_ETAG = f'"{hashlib.sha256(_index_html_bytes).hexdigest()}"'
+        _INDEX_HTML_RESPONSE = HTMLResponse(
+            content=_index_html_bytes, status_code=200, headers={"ETag": _INDEX_HTML_ETAG}
+        )
+
     @app.get("/{full_path:path}", response_class=HTMLResponse)
-    async def serve_react_app(full_path: str):
+    async def serve_react_app(full_path: str, request: Request):
         """
         Serve the React application.
         This endpoint catches all other paths and serves the index.html,
         allowing React Router to handle the client-side routing.
         """
-        index_path = static_dir / "index.html"
-        if index_path.exists():
-            with open(index_path, "r") as f:
-                return HTMLResponse(content=f.read(), status_code=200)
-        return HTMLResponse(content="Frontend not found.", status_code=404)
+        if _INDEX_HTML_RESPONSE is None:
+            return _FRONTEND_MISSING_RESPONSE
+        if request.headers.get("if-none-match") == _INDEX_HTML_ETAG:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": _INDEX_HTML_ETAG})
+        return _INDEX_HTML_RESPONSE
 else:
     logger.warning("Static directory not found. Frontend will not be served.")
\ No newline at end of file
@@ -1,17 +1,20 @@
 # backend/src/metrics_aggregator.py
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, Any, List
+from datetime import datetime
+from typing import Dict, List, Tuple
 
 from .models import LiveStatus, ErrorSummary, FinancialMetrics
 from .redis_consumer import VocodeRedisConsumer
 
 logger = logging.getLogger(__name__)
 
+# Validated once; the idle path only swaps in last_updated
+_HEALTHY_LIVE_STATUS = LiveStatus(status="green", last_updated=datetime.min, message="System healthy.")
+
 class MetricsAggregator:
-    def __init__(self) -> None:
-        # error_buffer is now directly accessed from redis_consumer
-        pass
+    def __init__(self, app_start_time: datetime) -> None:
+        # Windowed error aggregates are maintained incrementally by redis_consumer
+        self.app_start_time: datetime = app_start_time  # Min Run baseline; reset by the demo reset endpoint
 
     ERROR_COSTS: Dict[str, float] = {
         'low': 0.68,
@@ -20,86 +23,104 @@ class MetricsAggregator:
         'critical': 117.85
     }
     AVG_VALUE_PER_ACTIVE_CALL_PER_MINUTE: float = 1.00 # $1.00/min per call for simplicity in demo
+    # Severity weights for weighted error scoring
+    SEVERITY_WEIGHTS: Dict[str, int] = {
+        'low': 1,
+        'medium': 3,
+        'high': 5,
+        'critical': 10  # For critical business impact errors
+    }
+
+    def aggregate_all(
+        self, redis_consumer: VocodeRedisConsumer | None, now: datetime | None = None
+    ) -> Tuple[LiveStatus, List[ErrorSummary], FinancialMetrics]:
+        """
+        Compute live status, the 24h error summary and financial metrics from the
+        consumer's running window aggregates, expiring old entries only once.
+        A single `now` is used for every timestamp and window cutoff in the pass.
+        """
+        now = now or datetime.now()
+        if redis_consumer is None:
+            return (
+                self.calculate_live_status(None, now),
+                [],
+                self._build_financial_metrics(now, None, 0.0)
+            )
 
-    def calculate_financial_metrics(self, redis_consumer: VocodeRedisConsumer | None) -> FinancialMetrics:
-        now = datetime.now()
-        
+        redis_consumer.evict_expired(int(now.timestamp() * 1000))
+        return (
+            self._build_live_status(now, redis_consumer.live_severity_counts),
+            self._build_error_summary(redis_consumer),
+            self._build_financial_metrics(
+                now, redis_consumer, self._cost_of_recent_errors(redis_consumer.live_severity_counts)
+            )
+        )
+
+    def _cost_of_recent_errors(self, severity_counts: Dict[str, int]) -> float:
+        return sum(self.ERROR_COSTS.get(severity, 0.0) * count for severity, count in severity_counts.items())
+
+    def _build_financial_metrics(
+        self,
+        now: datetime,
+        redis_consumer: VocodeRedisConsumer | None,
+        estimated_cost_of_recent_errors: float
+    ) -> FinancialMetrics:
+        """Derive revenue, Min Run and ROI from the already-summed cost of recent errors."""
         estimated_revenue_per_min = 0.0
         if redis_consumer:
             estimated_revenue_per_min = redis_consumer.active_calls * self.AVG_VALUE_PER_ACTIVE_CALL_PER_MINUTE
 
-        estimated_cost_of_recent_errors = 0.0
-        if redis_consumer:
-            recent_errors = [
-                e for e in list(redis_consumer.error_buffer)
-                if now - datetime.fromtimestamp(float(e['timestamp']) / 1000) < timedelta(minutes=5)
-            ]
-            for error in recent_errors:
-                severity = error.get('severity', 'medium').lower()
-                estimated_cost_of_recent_errors += self.ERROR_COSTS.get(severity, 0.0)
-
         # Calculate Min Run and Total ROI
-        min_run = 0.0
-        total_roi = 0.0
-        
-        # Import here to avoid circular imports
-        import src.main as main_app_globals
-        if main_app_globals.app_start_time:
-            time_delta = now - main_app_globals.app_start_time
-            min_run = time_delta.total_seconds() / 60.0
-            total_roi = (min_run * estimated_revenue_per_min) - estimated_cost_of_recent_errors
-            
-            # Debug logging
-            logger.info(f"Financial Metrics Debug - Active Calls: {redis_consumer.active_calls if redis_consumer else 0}, "
-                       f"Revenue/Min: ${estimated_revenue_per_min:.2f}, "
-                       f"Error Cost: ${estimated_cost_of_recent_errors:.2f}, "
-                       f"Min Run: {min_run:.2f}, "
-                       f"Total ROI: ${total_roi:.2f}")
-
-        return FinancialMetrics(
-            estimated_revenue_per_min=round(estimated_revenue_per_min, 2),
-            estimated_cost_of_recent_errors=round(estimated_cost_of_recent_errors, 2),
-            total_roi=round(total_roi, 2)
+        time_delta = now - self.app_start_time
+        min_run = time_delta.total_seconds() / 60.0
+        total_roi = (min_run * estimated_revenue_per_min) - estimated_cost_of_recent_errors
+
+        # Debug logging
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Financial Metrics Debug - Active Calls: %d, Revenue/Min: $%.2f, "
+                         "Error Cost: $%.2f, Min Run: %.2f, Total ROI: $%.2f",
+                         redis_consumer.active_calls if redis_consumer else 0,
+                         estimated_revenue_per_min,
+                         estimated_cost_of_recent_errors,
+                         min_run,
+                         total_roi)
+
+        # Built from internal, already-typed values on every tick; validation is skipped.
+        # Full precision is kept, the dashboard formats to cents with toFixed(2).
+        return FinancialMetrics.model_construct(
+            estimated_revenue_per_min=estimated_revenue_per_min,
+            estimated_cost_of_recent_errors=estimated_cost_of_recent_errors,
+            total_roi=total_roi
         )
 
-    def calculate_live_status(self, redis_consumer: VocodeRedisConsumer | None) -> LiveStatus:
+    def calculate_live_status(
+        self, redis_consumer: VocodeRedisConsumer | None, now: datetime | None = None
+    ) -> LiveStatus:
         """Calculate system health based on recent metrics with severity weighting."""
-        now = datetime.now()
-        # Convert deque to list for easier filtering, assuming 'timestamp' is a string of epoch milliseconds
+        now = now or datetime.now()
         if redis_consumer is None:
             return LiveStatus(
                 status="red",
                 last_updated=now,
                 message="Redis consumer not initialized"
             )
-        
-        recent_errors = [
-            e for e in list(redis_consumer.error_buffer)
-            if now - datetime.fromtimestamp(float(e['timestamp']) / 1000) < timedelta(minutes=5)
-        ]
 
-        # Define severity weights for weighted error scoring
-        severity_weights = {
-            'low': 1,
-            'medium': 3,
-            'high': 5,
-            'critical': 10  # For critical business impact errors
-        }
+        redis_consumer.evict_expired(int(now.timestamp() * 1000))
+        return self._build_live_status(now, redis_consumer.live_severity_counts)
+
+    def _build_live_status(self, now: datetime, severity_counts: Dict[str, int]) -> LiveStatus:
+        """Map the 5-minute per-severity error counts (lowercased at ingest) onto a green/yellow/red status."""
+        if not severity_counts:
+            return _HEALTHY_LIVE_STATUS.model_copy(update={"last_updated": now})
 
         # Calculate weighted error score
-        total_error_score = 0
-        high_severity_count = 0
-        critical_severity_count = 0
-        
-        for error in recent_errors:
-            severity = error.get('severity', 'medium').lower()
-            weight = severity_weights.get(severity, 3)  # Default to medium weight
-            total_error_score += weight
-            
-            if severity == 'high':
-                high_severity_count += 1
-            elif severity == 'critical':
-                critical_severity_count += 1
+        total_error_score = sum(
+            self.SEVERITY_WEIGHTS.get(severity, 3) * count  # Default to medium weight
+            for severity, count in severity_counts.items()
+        )
+        high_severity_count = severity_counts.get('high', 0)
+        critical_severity_count = severity_counts.get('critical', 0)
+        recent_error_count = sum(severity_counts.values())
 
         status: str
         message: str | None = None
@@ -121,53 +142,25 @@ class MetricsAggregator:
                 message = f"WARNING: {total_error_score} weighted error score indicates potential issues."
         else:
             status = "green"
-            if len(recent_errors) > 0:
-                message = f"System healthy. {len(recent_errors)} low/medium severity errors in last 5 minutes."
+            if recent_error_count > 0:
+                message = f"System healthy. {recent_error_count} low/medium severity errors in last 5 minutes."
             else:
                 message = "System healthy."
 
-        return LiveStatus(
+        return LiveStatus.model_construct(
             status=status,
             last_updated=now,
             message=message
         )
 
-    def get_24h_error_summary(self, redis_consumer: VocodeRedisConsumer | None) -> List[ErrorSummary]:
-        """Aggregate last 24 hours of errors."""
-        now = datetime.now()
-        cutoff = now - timedelta(hours=24)
-        
-        if redis_consumer is None:
-            return []
-        
-        # Convert deque to list for easier filtering
-        recent_errors: List[Dict[str, Any]] = [
-            e for e in list(redis_consumer.error_buffer)
-            if datetime.fromtimestamp(float(e['timestamp']) / 1000) > cutoff
-        ]
-
-        error_counts: Dict[str, Dict[str, Any]] = {}
-        for error in recent_errors:
-            error_type: str = error.get('error_type', 'unknown')
-            timestamp_dt: datetime = datetime.fromtimestamp(float(error['timestamp']) / 1000)
-
-            if error_type not in error_counts:
-                error_counts[error_type] = {
-                    'count': 0,
-                    'last_occurrence': timestamp_dt,
-                    'severity': error.get('severity', 'medium')
-                }
-            error_counts[error_type]['count'] += 1
-            # Update last_occurrence if this error is more recent
-            if timestamp_dt > error_counts[error_type]['last_occurrence']:
-                error_counts[error_type]['last_occurrence'] = timestamp_dt
-
+    def _build_error_summary(self, redis_consumer: VocodeRedisConsumer) -> List[ErrorSummary]:
+        """One summary row per error type in the 24h window; O(types), not O(errors)."""
         return [
-            ErrorSummary(
+            ErrorSummary.model_construct(
                 error_type=error_type,
-                count=data['count'],
-                last_occurrence=data['last_occurrence'],
-                severity=data['severity']
+                count=len(type_window),
+                last_occurrence=datetime.fromtimestamp(type_window[-1]['timestamp'] / 1000),
+                severity=type_window[0]['severity']
             )
-            for error_type, data in error_counts.items()
-        ] 
\ No newline at end of file
+            for error_type, type_window in redis_consumer.summary_by_type.items()
+        ]
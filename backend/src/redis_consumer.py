@@ -1,15 +1,30 @@
 # backend/src/redis_consumer.py
 import asyncio
 import logging
-from collections import deque
-from typing import Dict, Any, List, Optional, cast
+import sys
+import time
+from collections import defaultdict, deque
+from typing import Callable, Dict, Any, List, Optional, cast
 
 import redis.asyncio as redis
+from redis.utils import HIREDIS_AVAILABLE
 
 from .models import RedisStreamInfo, RedisXReadResult
 
 logger = logging.getLogger(__name__)
 
+# Hard cap on buffered errors; entries older than the summary window are also trimmed
+ERROR_BUFFER_MAXLEN: int = 1000
+
+# Sliding windows the dashboard aggregates over
+LIVE_WINDOW_MS: int = 5 * 60 * 1000  # Live status and cost of recent errors
+SUMMARY_WINDOW_MS: int = 24 * 60 * 60 * 1000  # Error summary table
+
+# Max entries per stream per XREAD; large enough that a backlog drains in a few round-trips
+XREAD_BATCH_SIZE: int = 500
+# Server-side block on an idle XREAD; new entries still return immediately
+XREAD_BLOCK_MS: int = 5000
+
 class VocodeRedisConsumer:
     def __init__(self, redis_host: str = "localhost", redis_port: int = 6379) -> None:
         try:
@@ -18,9 +33,15 @@ class VocodeRedisConsumer:
                 host=redis_host,
                 port=redis_port,
                 decode_responses=True,  # Ensure responses are decoded to strings
-                retry_on_timeout=True
+                retry_on_timeout=True,
+                # Keep the long-lived XREAD connection from silently half-closing while idle
+                socket_keepalive=True,
+                health_check_interval=30,
+                socket_connect_timeout=5
             )
             logger.info(f"Connected to Redis at {redis_host}:{redis_port}")
+            if not HIREDIS_AVAILABLE:
+                logger.warning("hiredis is not installed; Redis replies will be parsed in pure Python.")
         except redis.ConnectionError as e:
             logger.critical(f"Failed to connect to Redis: {e}")
             # Depending on severity, you might want to raise here or implement retry logic
@@ -29,7 +50,25 @@ class VocodeRedisConsumer:
         # In-memory storage for real-time metrics
         self.active_calls: int = 0
         # Use a list of dictionaries for error_buffer to maintain type consistency
-        self.error_buffer: deque[Dict[str, Any]] = deque(maxlen=1000)
+        self.error_buffer: deque[Dict[str, Any]] = deque(maxlen=ERROR_BUFFER_MAXLEN)
+        # Secondary index of error_buffer by error_type, insertion (oldest-first) ordered
+        self.errors_by_type: defaultdict[str, deque[Dict[str, Any]]] = defaultdict(deque)
+        # Set whenever active_calls or the buffered errors change so the metrics producer
+        # can push updates immediately instead of waiting for its next refresh tick
+        self.metrics_dirty: asyncio.Event = asyncio.Event()
+        # Running aggregates over error_buffer, updated on append and eviction so the
+        # dashboard never has to rescan the buffer. Both windows are subsequences of
+        # error_buffer in arrival order; errors are assumed to arrive roughly in timestamp order.
+        self._live_window: deque[Dict[str, Any]] = deque()
+        self.live_severity_counts: Dict[str, int] = {}  # lowercased severity -> count in the live window
+        self._summary_window: deque[Dict[str, Any]] = deque()
+        self.summary_by_type: Dict[str, deque[Dict[str, Any]]] = {}  # error_type -> its errors in the summary window
+        # Stream name -> handler; add an entry here (and in last_processed_ids) to consume a new stream
+        self._stream_handlers: Dict[str, Callable[[str, Dict[str, Any]], None]] = {
+            "vocode:conversations": self._handle_conversation_event,
+            "vocode:errors": self._handle_error_event,
+            "vocode:metrics": self._handle_metrics_event,
+        }
         self.last_processed_ids: Dict[str, str] = {
             "vocode:conversations": "0-0",  # Start from beginning to catch existing messages
             "vocode:errors": "0-0",  # Start from beginning to catch existing messages
@@ -39,6 +78,88 @@ class VocodeRedisConsumer:
         # Initialize to start from the latest message ID for existing streams
         # Note: This will be called in the lifespan function after Redis connection is established
 
+    def add_error(self, error_data: Dict[str, Any]) -> None:
+        """
+        Append an error to error_buffer and keep the per-type index and windows in sync.
+        The timestamp is normalized to int epoch-ms and severity to an interned lowercase
+        string here, once, so nothing downstream has to re-parse them and the buffered
+        records share one object per severity.
+        """
+        error_data['timestamp'] = int(error_data['timestamp'])
+        error_data['severity'] = sys.intern(error_data.get('severity', 'medium').lower())
+        if len(self.error_buffer) == self.error_buffer.maxlen:
+            self._pop_oldest()
+        self.error_buffer.append(error_data)
+        self.errors_by_type[error_data['error_type']].append(error_data)
+
+        now_ms = time.time_ns() // 1_000_000
+        timestamp_ms: int = error_data['timestamp']
+        if timestamp_ms > now_ms - SUMMARY_WINDOW_MS:
+            self._summary_window.append(error_data)
+            type_window = self.summary_by_type.get(error_data['error_type'])
+            if type_window is None:
+                type_window = self.summary_by_type[error_data['error_type']] = deque()
+            type_window.append(error_data)
+        if timestamp_ms > now_ms - LIVE_WINDOW_MS:
+            self._live_window.append(error_data)
+            severity: str = error_data['severity']
+            self.live_severity_counts[severity] = self.live_severity_counts.get(severity, 0) + 1
+        self.metrics_dirty.set()
+
+    def evict_expired(self, now_ms: int) -> None:
+        """
+        Drop errors that have aged out of the live and summary windows, and trim
+        error_buffer to the summary window so quiet periods don't retain stale history.
+        """
+        live_cutoff_ms = now_ms - LIVE_WINDOW_MS
+        while self._live_window and self._live_window[0]['timestamp'] <= live_cutoff_ms:
+            self._pop_live()
+        summary_cutoff_ms = now_ms - SUMMARY_WINDOW_MS
+        while self._summary_window and self._summary_window[0]['timestamp'] <= summary_cutoff_ms:
+            self._pop_summary()
+        while self.error_buffer and self.error_buffer[0]['timestamp'] <= summary_cutoff_ms:
+            self._pop_oldest()
+
+    def _pop_oldest(self) -> None:
+        """Evict the oldest buffered error; it is also the oldest of its type."""
+        evicted = self.error_buffer.popleft()
+        evicted_type: str = evicted['error_type']
+        type_buffer = self.errors_by_type.get(evicted_type)
+        if type_buffer:
+            type_buffer.popleft()
+            if not type_buffer:
+                del self.errors_by_type[evicted_type]
+        # If it is still inside a window, it is that window's oldest entry
+        if self._live_window and self._live_window[0] is evicted:
+            self._pop_live()
+        if self._summary_window and self._summary_window[0] is evicted:
+            self._pop_summary()
+
+    def _pop_live(self) -> None:
+        severity: str = self._live_window.popleft()['severity']
+        remaining = self.live_severity_counts[severity] - 1
+        if remaining:
+            self.live_severity_counts[severity] = remaining
+        else:
+            del self.live_severity_counts[severity]
+
+    def _pop_summary(self) -> None:
+        error_type: str = self._summary_window.popleft()['error_type']
+        type_window = self.summary_by_type[error_type]
+        type_window.popleft()
+        if not type_window:
+            del self.summary_by_type[error_type]
+
+    def clear_errors(self) -> None:
+        """Remove all buffered errors, their per-type index and the running aggregates."""
+        self.error_buffer.clear()
+        self.errors_by_type.clear()
+        self._live_window.clear()
+        self.live_severity_counts.clear()
+        self._summary_window.clear()
+        self.summary_by_type.clear()
+        self.metrics_dirty.set()
+
     async def initialize_stream_positions(self) -> None:
         """Initialize stream positions to read from the beginning of existing streams."""
         logger.debug("Starting stream position initialization...")
@@ -88,59 +209,40 @@ class VocodeRedisConsumer:
                     for stream_name in stream_names
                 }
                 
-                logger.debug(f"About to call xread with streams: {streams_to_read}")
+                # Debug lines in this loop use %-style arguments: with batches of up to
+                # XREAD_BATCH_SIZE entries, eager f-strings would repr every reply at any log level
+                logger.debug("About to call xread with streams: %s", streams_to_read)
                 
                 # Redis xread returns a list of tuples: (stream_name, [(msg_id, fields_dict), ...])
                 # Use blocking read with timeout for real-time processing
                 messages: RedisXReadResult = cast(RedisXReadResult, await self.redis_client.xread(  # type: ignore
                     streams_to_read,  # type: ignore
-                    count=10,  # Process in small batches
-                    block=1000, # Block for 1 second to get real-time updates
+                    count=XREAD_BATCH_SIZE,
+                    block=XREAD_BLOCK_MS,
                 ))
 
-                logger.debug(f"xread returned: {messages}")
+                logger.debug("xread returned: %s", messages)
 
                 if messages:
                     logger.info(f"Received {len(messages)} message batches")
                     for stream_entry in messages:
                         if len(stream_entry) != 2:
-                            logger.debug(f"Skipping malformed stream entry: {stream_entry}")
+                            logger.debug("Skipping malformed stream entry: %s", stream_entry)
                             continue
-                        stream_name_bytes, msgs_list = stream_entry
-                        # Handle both bytes and string stream names
-                        if isinstance(stream_name_bytes, bytes):
-                            stream_name = stream_name_bytes.decode('utf-8')
-                        else:
-                            stream_name = stream_name_bytes
+                        # The client uses decode_responses=True, so names, IDs and fields are already str
+                        stream_name, msgs_list = stream_entry
                         
-                        # msgs_list is guaranteed to be a list based on our type annotations
-                            
                         logger.info(f"Processing {len(msgs_list)} messages from stream {stream_name}")
                         
                         for msg_entry in msgs_list:
                             if len(msg_entry) != 2:
-                                logger.debug(f"Skipping malformed message entry: {msg_entry}")
+                                logger.debug("Skipping malformed message entry: %s", msg_entry)
                                 continue
-                            msg_id_bytes, fields_dict_bytes = msg_entry
-                            # Handle both bytes and string message IDs
-                            if isinstance(msg_id_bytes, bytes):
-                                msg_id = msg_id_bytes.decode('utf-8')
-                            else:
-                                msg_id = msg_id_bytes
-                            logger.debug(f"Processing message {msg_id} from stream {stream_name}")
-                            
-                            # Redis returns fields as bytes, decode them
-                            fields: Dict[str, str] = {}
-                            for k, v in fields_dict_bytes.items():
-                                if isinstance(k, bytes) and isinstance(v, bytes):
-                                    fields[k.decode('utf-8')] = v.decode('utf-8')
-                                else:
-                                    fields[k] = v
-                            
-                            logger.debug(f"Decoded fields for message {msg_id}: {fields}")
+                            msg_id, fields = msg_entry
+                            logger.debug("Processing message %s from stream %s", msg_id, stream_name)
                             await self.process_message(stream_name, msg_id, fields)
                             self.last_processed_ids[stream_name] = msg_id # Update last processed ID for this stream
-                            logger.debug(f"Updated last processed ID for {stream_name}: {msg_id}")
+                            logger.debug("Updated last processed ID for %s: %s", stream_name, msg_id)
                 else:
                     # No messages available, log occasionally to show the service is running
                     logger.debug("No messages in Redis streams, continuing to poll...")
@@ -155,41 +257,49 @@ class VocodeRedisConsumer:
                 await asyncio.sleep(1)
 
     async def process_message(self, stream: str, msg_id: str, fields: Dict[str, Any]) -> None:
-        """Process individual Vocode events."""
+        """Process individual Vocode events by dispatching on the stream name."""
         try:
-            logger.debug(f"Processing message from {stream} with ID {msg_id}: {fields}")
-            if stream == "vocode:conversations":
-                event_type: Optional[str] = fields.get("event")
-                logger.debug(f"Conversation event type: {event_type}")
-                if event_type == "call_started":
-                    self.active_calls += 1
-                    logger.info(f"Call started. Active calls: {self.active_calls}")
-                elif event_type == "call_ended":
-                    self.active_calls = max(0, self.active_calls - 1)
-                    logger.info(f"Call ended. Active calls: {self.active_calls}")
-                else:
-                    logger.debug(f"Unhandled conversation event type: {event_type}")
-                # Add other conversation events if needed
-            elif stream == "vocode:errors":
-                logger.debug(f"Processing error message with fields: {fields}")
-                # Ensure timestamp is a string representation of an integer for consistency
-                # msg_id is typically "timestamp-sequence"
-                timestamp_str: str = msg_id.split('-')[0]
-                error_data: Dict[str, Any] = {
-                    "timestamp": timestamp_str,
-                    "error_type": fields.get("error_type", "unknown_error"),
-                    "message": fields.get("message", "No message provided"),
-                    "severity": fields.get("severity", "medium"),
-                    "conversation_id": fields.get("conversation_id", "N/A") # Important for drill-down
-                }
-                logger.debug(f"Created error data: {error_data}")
-                self.error_buffer.append(error_data)
-                logger.warning(f"Error received: {error_data['error_type']} - {error_data['message']}")
-                logger.debug(f"Error buffer size after append: {len(self.error_buffer)}")
-            elif stream == "vocode:metrics":
-                logger.debug(f"Processing metrics message: {fields}")
-                # You can add logic for "vocode:metrics" if that stream contains other relevant data
-            else:
-                logger.debug(f"Unhandled stream type: {stream}")
+            logger.debug("Processing message from %s with ID %s: %s", stream, msg_id, fields)
+            handler = self._stream_handlers.get(stream)
+            if handler is None:
+                logger.debug("Unhandled stream type: %s", stream)
+                return
+            handler(msg_id, fields)
         except Exception as e:
-            logger.exception(f"Error processing message from stream {stream} (ID: {msg_id}): {e}") 
\ No newline at end of file
+            logger.exception(f"Error processing message from stream {stream} (ID: {msg_id}): {e}")
+
+    def _handle_conversation_event(self, msg_id: str, fields: Dict[str, Any]) -> None:
+        event_type: Optional[str] = fields.get("event")
+        logger.debug("Conversation event type: %s", event_type)
+        if event_type == "call_started":
+            self.active_calls += 1
+            self.metrics_dirty.set()
+            logger.info(f"Call started. Active calls: {self.active_calls}")
+        elif event_type == "call_ended":
+            self.active_calls = max(0, self.active_calls - 1)
+            self.metrics_dirty.set()
+            logger.info(f"Call ended. Active calls: {self.active_calls}")
+        else:
+            logger.debug("Unhandled conversation event type: %s", event_type)
+        # Add other conversation events if needed
+
+    def _handle_error_event(self, msg_id: str, fields: Dict[str, Any]) -> None:
+        logger.debug("Processing error message with fields: %s", fields)
+        # Store the timestamp as integer epoch milliseconds for consistency
+        # msg_id is typically "timestamp-sequence"
+        timestamp_ms: int = int(msg_id.partition('-')[0])
+        error_data: Dict[str, Any] = {
+            "timestamp": timestamp_ms,
+            "error_type": fields.get("error_type", "unknown_error"),
+            "message": fields.get("message", "No message provided"),
+            "severity": fields.get("severity", "medium"),
+            "conversation_id": fields.get("conversation_id", "N/A") # Important for drill-down
+        }
+        logger.debug("Created error data: %s", error_data)
+        self.add_error(error_data)
+        logger.warning(f"Error received: {error_data['error_type']} - {error_data['message']}")
+        logger.debug("Error buffer size after append: %d", len(self.error_buffer))
+
+    def _handle_metrics_event(self, msg_id: str, fields: Dict[str, Any]) -> None:
+        logger.debug("Processing metrics message: %s", fields)
+        # You can add logic for "vocode:metrics" if that stream contains other relevant data
@@ -1,52 +1,92 @@
 # backend/src/websocket_manager.py
-import json
+import asyncio
 import logging
-from typing import List
+from typing import Dict, Set
 
+import orjson
 from fastapi import WebSocket
 
 from .models import DashboardMetrics
 
 logger = logging.getLogger(__name__)
 
+def serialize_metrics(metrics: DashboardMetrics) -> str:
+    """
+    Serialize metrics with orjson. Decoded to str so clients keep receiving
+    text frames they can JSON.parse directly.
+    """
+    return orjson.dumps(metrics.model_dump()).decode()
+
 class ConnectionManager:
     def __init__(self) -> None:
-        self.active_connections: List[WebSocket] = []
+        # A set makes disconnect O(1); broadcast order does not matter
+        self.active_connections: Set[WebSocket] = set()
+        # Each connection gets one long-lived writer task draining its own single-slot queue.
+        # Metrics are full snapshots, so only the latest unsent payload is ever kept.
+        self._send_queues: Dict[WebSocket, asyncio.Queue[str]] = {}
+        self._writer_tasks: Dict[WebSocket, asyncio.Task[None]] = {}
 
     async def connect(self, websocket: WebSocket) -> None:
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.active_connections.add(websocket)
+        self._send_queues[websocket] = asyncio.Queue(maxsize=1)
+        self._writer_tasks[websocket] = asyncio.create_task(self._writer_loop(websocket))
         logger.info(f"WebSocket connected. Total connections: {len(self.active_connections)}")
         if websocket.client:
             logger.debug(f"WebSocket client info: {websocket.client.host}:{websocket.client.port}")
 
     def disconnect(self, websocket: WebSocket) -> None:
-        try:
-            self.active_connections.remove(websocket)
+        self._send_queues.pop(websocket, None)
+        writer = self._writer_tasks.pop(websocket, None)
+        if writer is not None and writer is not asyncio.current_task():
+            writer.cancel()
+        # Called by both the writer loop and the endpoint, so a second call is expected and silent
+        if websocket in self.active_connections:
+            self.active_connections.discard(websocket)
             logger.info(f"WebSocket disconnected. Total connections: {len(self.active_connections)}")
-        except ValueError:
-            logger.warning("Attempted to remove non-existent WebSocket from active connections.")
+
+    async def send_metrics(self, websocket: WebSocket, metrics: DashboardMetrics) -> None:
+        """Queue a metrics snapshot for a single connection."""
+        queue = self._send_queues.get(websocket)
+        if queue is not None:
+            self._enqueue_latest(queue, serialize_metrics(metrics))
 
     async def broadcast_metrics(self, metrics: DashboardMetrics) -> None:
-        disconnected_connections: List[WebSocket] = []
-        
         # Debug logging for financial metrics
-        logger.info(f"Broadcasting metrics - Active connections: {len(self.active_connections)}, "
-                   f"Financial Impact: {metrics.financial_impact}")
-        
-        for connection in self.active_connections:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Broadcasting metrics - Active connections: %d, Financial Impact: %s",
+                         len(self.active_connections), metrics.financial_impact)
+
+        # Serialize once per broadcast; every client receives the identical payload
+        await self.broadcast_raw(serialize_metrics(metrics))
+
+    async def broadcast_raw(self, payload: str) -> None:
+        """Queue an already-serialized payload for every active connection's writer task."""
+        for queue in self._send_queues.values():
+            self._enqueue_latest(queue, payload)
+
+    @staticmethod
+    def _enqueue_latest(queue: asyncio.Queue[str], payload: str) -> None:
+        """Replace any stale payload a slow client has not picked up yet with the newest one."""
+        while not queue.empty():
+            queue.get_nowait()
+            logger.debug("Coalesced stale metrics payload for slow WebSocket client")
+        queue.put_nowait(payload)
+
+    async def _writer_loop(self, websocket: WebSocket) -> None:
+        """Drain a connection's send queue, dropping the connection on send failure."""
+        queue = self._send_queues[websocket]
+        while True:
+            payload = await queue.get()
             try:
-                # Convert Pydantic model to dict and handle datetime serialization
-                metrics_dict = metrics.model_dump(mode='json')
-                await connection.send_text(json.dumps(metrics_dict))
+                await websocket.send_text(payload)
                 logger.debug(f"Successfully sent metrics to WebSocket")
             except RuntimeError as e: # Catch specific runtime errors for disconnected sockets
                 logger.warning(f"Failed to send to WebSocket (likely disconnected): {e}")
-                disconnected_connections.append(connection)
+                break
             except Exception as e:
                 logger.exception(f"Error broadcasting to WebSocket: {e}")
-                disconnected_connections.append(connection)
+                break
 
-        # Clean up disconnected clients
-        for conn in disconnected_connections:
-            self.disconnect(conn) 
\ No newline at end of file
+        # Clean up disconnected client
+        self.disconnect(websocket)
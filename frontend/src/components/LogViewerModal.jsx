@@ -20,7 +20,7 @@ const LogViewerModal = ({ isOpen, onClose, errorType, logs }) => {
               {logs.map((log, index) => (
                 <div key={index} className="log-entry-modal">
                   <span className="log-timestamp">
-                    {new Date(parseInt(log.timestamp)).toLocaleString()}
+                    {new Date(Number(log.timestamp)).toLocaleString()}
                   </span>
                   <p className="log-message">{log.message}</p>
                   <span className={`log-severity severity ${log.severity.toLowerCase()}`}>